@@ -6,14 +6,49 @@ Unified SMHI Weather API Test Script
 3. Compares both approaches
 """
 
+import hashlib
 import json
 import requests
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime, timedelta
 from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import os
 import sys
+import tempfile
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # API Configuration
 API_URL = "https://opendata-download-metfcst.smhi.se/api/category/pmp3g/version/2/geotype/point/lon/15.59/lat/56.16/data.json"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read per chunk while streaming the response
+
+# Persistent HTTP session: keeps the TLS connection alive between fetches
+# and retries transient server errors before giving up
+_SESSION = requests.Session()
+_SESSION.headers["Accept-Encoding"] = "gzip"
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1, pool_maxsize=1,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))))
+
+# Local forecast cache (SMHI updates the forecast roughly once an hour).
+# File names include a hash of API_URL so a changed location is never served
+# another location's forecast.
+CACHE_DIR = Path.home() / ".cache" / "smhi"
+_CACHE_KEY = hashlib.sha256(API_URL.encode()).hexdigest()[:12]
+CACHE_FILE = CACHE_DIR / f"forecast-{_CACHE_KEY}.json"
+CACHE_ETAG_FILE = CACHE_DIR / f"forecast-{_CACHE_KEY}.etag"
+CACHE_LASTMOD_FILE = CACHE_DIR / f"forecast-{_CACHE_KEY}.lastmod"
+CACHE_TTL = 10 * 60  # Seconds before the cached forecast is revalidated
+
+FORECAST_DAYS = 6  # Days shown in the daily forecast, starting tomorrow
 
 # Weather symbol descriptions
 WEATHER_SYMBOLS = {
@@ -27,6 +62,10 @@ WEATHER_SYMBOLS = {
     24: "Heavy sleet", 25: "Light snowfall", 26: "Moderate snowfall", 27: "Heavy snowfall"
 }
 
+# 16-point compass, 22.5° per sector starting at north
+WIND_DIRECTIONS = ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                   "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW")
+
 # Parameter descriptions
 PARAMETER_INFO = {
     "t": ("Temperature", "°C"), "ws": ("Wind Speed", "m/s"),
@@ -41,14 +80,108 @@ PARAMETER_INFO = {
     "Wsymb2": ("Weather Symbol", ""), "tp": ("Total Precipitation", "mm")
 }
 
+# Parameter categories, in display order
+PARAMETER_CATEGORIES = {
+    "Temperature": ["t"],
+    "Wind": ["ws", "wd", "gust"],
+    "Humidity/Pressure": ["r", "msl"],
+    "Visibility": ["vis"],
+    "Clouds": ["tcc_mean", "lcc_mean", "mcc_mean", "hcc_mean"],
+    "Precipitation": ["pmean", "pmin", "pmax", "pmedian", "pcat", "tp"],
+    "Weather Conditions": ["Wsymb2", "tstm", "spp"]
+}
+PARAM_TO_CATEGORY = {p: cat for cat, plist in PARAMETER_CATEGORIES.items() for p in plist}
+PARAM_ORDER = {p: i for i, p in enumerate(PARAM_TO_CATEGORY)}
+
+# Parameters used by the Arduino-style parsing and display
+ARDUINO_PARAMS = frozenset({"t", "r", "ws", "wd", "msl", "tstm", "Wsymb2", "gust"})
+
+# Row layout of the parameter table
+ROW_TMPL = "  {param:12} | {desc:25} | {unit:8} | {value}"
+
+# SMHI timestamps end in 'Z', which fromisoformat() only accepts from Python 3.11
+if sys.version_info >= (3, 11):
+    _fromisoformat = datetime.fromisoformat
+else:
+    def _fromisoformat(time_str):
+        if time_str.endswith('Z'):
+            time_str = time_str[:-1] + '+00:00'
+        return datetime.fromisoformat(time_str)
+
+# Parsed validTime strings; the same timestamps are parsed by several passes
+_dt_cache = {}
+
+def _parse_vt(time_str):
+    """Parse an SMHI validTime string, reusing earlier results"""
+    dt = _dt_cache.get(time_str)
+    if dt is None:
+        dt = _dt_cache[time_str] = _fromisoformat(time_str)
+    return dt
+
 def get_wind_direction(degrees):
     """Convert wind direction degrees to compass direction"""
     if degrees is None:
         return "N/A"
-    directions = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
-                  "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
-    index = int((degrees + 11.25) / 22.5) % 16
-    return directions[index]
+    return WIND_DIRECTIONS[int((degrees + 11.25) / 22.5) % 16]
+
+def _load_json(raw):
+    """Decode a JSON payload, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def _write_atomic(path, data):
+    """Write bytes to path via a temp file so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _clear_cache():
+    """Remove the cached forecast and its validators"""
+    for path in (CACHE_FILE, CACHE_ETAG_FILE, CACHE_LASTMOD_FILE):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️  Could not remove {path}: {e}")
+
+def _read_cache():
+    """Load the cached forecast, or None (clearing the cache) if it is unreadable"""
+    try:
+        return _load_json(CACHE_FILE.read_bytes())
+    except (OSError, ValueError):
+        _clear_cache()
+        return None
+
+def _save_cache(body, headers):
+    """Store the forecast and its HTTP validators for the next run"""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _write_atomic(CACHE_FILE, body)
+        for path, header in ((CACHE_ETAG_FILE, "ETag"), (CACHE_LASTMOD_FILE, "Last-Modified")):
+            if header in headers:
+                _write_atomic(path, headers[header].encode())
+            elif path.exists():
+                path.unlink()
+    except OSError as e:
+        print(f"⚠️  Could not cache forecast: {e}")
+
+def _download(headers):
+    """GET the forecast; returns (body, response headers), or None on 304 Not Modified"""
+    with _SESSION.get(API_URL, stream=True, timeout=30, headers=headers) as response:
+        if headers and response.status_code == 304:
+            return None
+        response.raise_for_status()
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            body.extend(chunk)
+        return body, response.headers
 
 def fetch_weather_data():
     """Fetch weather data from SMHI API"""
@@ -57,94 +190,130 @@ def fetch_weather_data():
     print("-" * 80)
 
     try:
-        response = requests.get(API_URL, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        fresh = time.time() - CACHE_FILE.stat().st_mtime < CACHE_TTL
+    except OSError:
+        fresh = False
+    if fresh:
+        data = _read_cache()
+        if data is not None:
+            print(f"Using cached forecast (fetched less than {CACHE_TTL // 60} minutes ago)")
+            return data
+
+    # Conditional GET: SMHI answers 304 if the cached forecast is still current
+    headers = {}
+    if CACHE_FILE.exists():
+        try:
+            if CACHE_ETAG_FILE.exists():
+                headers["If-None-Match"] = CACHE_ETAG_FILE.read_text()
+            if CACHE_LASTMOD_FILE.exists():
+                headers["If-Modified-Since"] = CACHE_LASTMOD_FILE.read_text()
+        except OSError:
+            headers = {}
+
+    try:
+        result = _download(headers)
+        if result is None:
+            data = _read_cache()
+            if data is not None:
+                print("Forecast not modified, using cached copy")
+                try:
+                    CACHE_FILE.touch()
+                except OSError:
+                    pass
+                return data
+            print("Cached forecast is unreadable, downloading it again")
+            result = _download({})
+        body, validators = result
+        data = _load_json(body)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # ValueError: the body is not valid JSON (orjson/json decode errors)
         print(f"❌ Error fetching data: {e}")
         sys.exit(1)
 
+    # Only cache payloads that decoded successfully
+    _save_cache(body, validators)
+    return data
+
 # =============================================================================
 # PART 1: API STRUCTURE ANALYSIS (from test_api.py)
 # =============================================================================
 
-def analyze_api_structure(data):
+def analyze_api_structure(data, today):
     """Analyze API data structure and time coverage"""
-    print("\n" + "=" * 80)
-    print("PART 1: API STRUCTURE ANALYSIS - Understanding SMHI Weather API")
-    print("=" * 80)
+    out = []
+    out.append("\n" + "=" * 80)
+    out.append("PART 1: API STRUCTURE ANALYSIS - Understanding SMHI Weather API")
+    out.append("=" * 80)
 
     # API Endpoint Info
-    print("\n🌐 API Endpoint:")
-    print(f"  URL: {API_URL}")
+    out.append("\n🌐 API Endpoint:")
+    out.append(f"  URL: {API_URL}")
     geometry = data.get('geometry', {})
     coords = geometry.get('coordinates', [[None, None]])[0]
-    print(f"  Location: Longitude {coords[0]}°, Latitude {coords[1]}°")
-    print(f"  → This is Karlskrona, Sweden")
-    print(f"  API Type: Point forecast (specific location)")
-    print(f"  Version: PMP3G v2 (SMHI's meteorological forecast)")
+    out.append(f"  Location: Longitude {coords[0]}°, Latitude {coords[1]}°")
+    out.append(f"  → This is Karlskrona, Sweden")
+    out.append(f"  API Type: Point forecast (specific location)")
+    out.append(f"  Version: PMP3G v2 (SMHI's meteorological forecast)")
 
     # Metadata
-    print(f"\n📅 Forecast Metadata:")
-    approved = datetime.fromisoformat(data['approvedTime'].replace('Z', '+00:00'))
-    reference = datetime.fromisoformat(data['referenceTime'].replace('Z', '+00:00'))
-    print(f"  Approved Time:  {approved.strftime('%Y-%m-%d %H:%M UTC')}")
-    print(f"  → When SMHI published this forecast")
-    print(f"  Reference Time: {reference.strftime('%Y-%m-%d %H:%M UTC')}")
-    print(f"  → Forecast calculation base time")
-    print(f"  Total Entries:  {len(data['timeSeries'])}")
-    print(f"  → Number of hourly forecast data points")
+    out.append(f"\n📅 Forecast Metadata:")
+    approved = _fromisoformat(data['approvedTime'])
+    reference = _fromisoformat(data['referenceTime'])
+    out.append(f"  Approved Time:  {approved.strftime('%Y-%m-%d %H:%M UTC')}")
+    out.append(f"  → When SMHI published this forecast")
+    out.append(f"  Reference Time: {reference.strftime('%Y-%m-%d %H:%M UTC')}")
+    out.append(f"  → Forecast calculation base time")
+    out.append(f"  Total Entries:  {len(data['timeSeries'])}")
+    out.append(f"  → Number of hourly forecast data points")
 
     # Analyze time series
-    days_data = defaultdict(list)
-    first_time = None
-    last_time = None
+    times = [_parse_vt(entry['validTime']) for entry in data['timeSeries']]
+    first_time = times[0]
+    last_time = times[-1]
+    days_stats = {}  # day -> [entry count, first hour, last hour]
 
-    for i, entry in enumerate(data['timeSeries']):
-        time_str = entry['validTime']
-        dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+    for dt in times:
         day = dt.date()
-
-        if i == 0:
-            first_time = dt
-        if i == len(data['timeSeries']) - 1:
-            last_time = dt
-
-        days_data[day].append(dt.hour)
+        hour = dt.hour
+        stats = days_stats.get(day)
+        if stats is None:
+            days_stats[day] = [1, hour, hour]
+        else:
+            stats[0] += 1
+            if hour < stats[1]:
+                stats[1] = hour
+            if hour > stats[2]:
+                stats[2] = hour
 
     # Calculate forecast duration
     duration = (last_time - first_time).total_seconds() / 3600
     duration_days = duration / 24
 
-    print(f"\n📊 Time Coverage:")
-    print(f"  First Entry:    {first_time.strftime('%Y-%m-%d %H:%M UTC')}")
-    print(f"  Last Entry:     {last_time.strftime('%Y-%m-%d %H:%M UTC')}")
-    print(f"  Duration:       {duration:.0f} hours ({duration_days:.1f} days)")
-    print(f"  Days Covered:   {len(days_data)} days")
-    print(f"  → SMHI provides ~10 days of hourly forecast data")
+    out.append(f"\n📊 Time Coverage:")
+    out.append(f"  First Entry:    {first_time.strftime('%Y-%m-%d %H:%M UTC')}")
+    out.append(f"  Last Entry:     {last_time.strftime('%Y-%m-%d %H:%M UTC')}")
+    out.append(f"  Duration:       {duration:.0f} hours ({duration_days:.1f} days)")
+    out.append(f"  Days Covered:   {len(days_stats)} days")
+    out.append(f"  → SMHI provides ~10 days of hourly forecast data")
 
-    print(f"\n📈 Daily Breakdown:")
-    print(f"  Shows how many forecast entries exist for each day:")
-    for i, (day, hours) in enumerate(sorted(days_data.items())):
+    out.append(f"\n📈 Daily Breakdown:")
+    out.append(f"  Shows how many forecast entries exist for each day:")
+    for i, (day, (count, first_hour, last_hour)) in enumerate(sorted(days_stats.items())):
         day_name = day.strftime("%A")
-        is_today = " (Today)" if day == datetime.now().date() else ""
-        print(f"  Day {i}: {day} {day_name:9}{is_today:8} - {len(hours):2} entries ({min(hours):02d}:00-{max(hours):02d}:00)")
+        is_today = " (Today)" if day == today else ""
+        out.append(f"  Day {i}: {day} {day_name:9}{is_today:8} - {count:2} entries ({first_hour:02d}:00-{last_hour:02d}:00)")
 
     # Check intervals
-    print(f"\n⏱️  Time Intervals Between Entries:")
-    print(f"  How much time between consecutive forecasts:")
-    intervals = []
-    for i in range(min(10, len(data['timeSeries'])-1)):
-        curr = datetime.fromisoformat(data['timeSeries'][i]['validTime'].replace('Z', '+00:00'))
-        next_time = datetime.fromisoformat(data['timeSeries'][i+1]['validTime'].replace('Z', '+00:00'))
-        diff = (next_time - curr).total_seconds() / 3600
-        intervals.append(diff)
-        if i < 5:
-            print(f"  Entry {i:2} → {i+1:2}: {diff:4.1f} hours")
+    out.append(f"\n⏱️  Time Intervals Between Entries:")
+    out.append(f"  How much time between consecutive forecasts:")
+    intervals = [(next_time - curr).total_seconds() / 3600
+                 for curr, next_time in zip(times[:10], times[1:11])]
+    for i, diff in enumerate(intervals[:5]):
+        out.append(f"  Entry {i:2} → {i+1:2}: {diff:4.1f} hours")
 
     avg_interval = sum(intervals) / len(intervals)
-    print(f"  Average:       {avg_interval:.1f} hours")
-    print(f"  → API provides hourly forecasts (1-hour intervals)")
+    out.append(f"  Average:       {avg_interval:.1f} hours")
+    out.append(f"  → API provides hourly forecasts (1-hour intervals)")
 
     # All available parameters
     all_params = set()
@@ -165,197 +334,181 @@ def analyze_api_structure(data):
                         'levelType': param.get("levelType")
                     }
 
-    print(f"\n🔧 Available Weather Parameters:")
-    print(f"  The API provides {len(all_params)} different weather measurements:")
-    print(f"  {'Parameter':12} | {'Description':25} | {'Unit':8} | {'Example Value'}")
-    print(f"  {'-'*12}-+-{'-'*25}-+-{'-'*8}-+-{'-'*20}")
+    out.append(f"\n🔧 Available Weather Parameters:")
+    out.append(f"  The API provides {len(all_params)} different weather measurements:")
+    out.append(ROW_TMPL.format(param="Parameter", desc="Description", unit="Unit", value="Example Value"))
+    out.append(f"  {'-'*12}-+-{'-'*25}-+-{'-'*8}-+-{'-'*20}")
 
     # Group parameters by category
-    categories = {
-        "Temperature": ["t"],
-        "Wind": ["ws", "wd", "gust"],
-        "Humidity/Pressure": ["r", "msl"],
-        "Visibility": ["vis"],
-        "Clouds": ["tcc_mean", "lcc_mean", "mcc_mean", "hcc_mean"],
-        "Precipitation": ["pmean", "pmin", "pmax", "pmedian", "pcat", "tp"],
-        "Weather Conditions": ["Wsymb2", "tstm", "spp"]
-    }
-
-    for category, params_in_cat in categories.items():
-        printed_category = False
-        for param in params_in_cat:
-            if param in all_params:
-                if not printed_category:
-                    print(f"\n  [{category}]")
-                    printed_category = True
-                info = PARAMETER_INFO.get(param, (param, ""))
-                example = param_examples[param]
-                value_str = f"{example['value']}"
-                if example['level'] is not None:
-                    value_str += f" @{example['level']}{example['levelType']}"
-                print(f"  {param:12} | {info[0]:25} | {info[1]:8} | {value_str}")
-
-    print(f"\n💡 Key Insights:")
-    print(f"  • API returns JSON with 'timeSeries' array")
-    print(f"  • Each entry has 'validTime' and 'parameters' array")
-    print(f"  • Covers ~{len(days_data)} days with {len(data['timeSeries'])} hourly forecasts")
-    print(f"  • Provides {len(all_params)} different weather parameters per entry")
-    print(f"  • Updated regularly (check 'approvedTime' for freshness)")
-    print(f"  • Weather Symbol (Wsymb2): 1-27 representing different conditions")
-
-    return days_data
+    printed_category = None
+    for param in sorted((p for p in all_params if p in PARAM_ORDER), key=PARAM_ORDER.get):
+        category = PARAM_TO_CATEGORY[param]
+        if category != printed_category:
+            out.append(f"\n  [{category}]")
+            printed_category = category
+        info = PARAMETER_INFO.get(param, (param, ""))
+        example = param_examples[param]
+        value_str = f"{example['value']}"
+        if example['level'] is not None:
+            value_str += f" @{example['level']}{example['levelType']}"
+        out.append(ROW_TMPL.format(param=param, desc=info[0], unit=info[1], value=value_str))
+
+    out.append(f"\n💡 Key Insights:")
+    out.append(f"  • API returns JSON with 'timeSeries' array")
+    out.append(f"  • Each entry has 'validTime' and 'parameters' array")
+    out.append(f"  • Covers ~{len(days_stats)} days with {len(data['timeSeries'])} hourly forecasts")
+    out.append(f"  • Provides {len(all_params)} different weather parameters per entry")
+    out.append(f"  • Updated regularly (check 'approvedTime' for freshness)")
+    out.append(f"  • Weather Symbol (Wsymb2): 1-27 representing different conditions")
+
+    sys.stdout.write("\n".join(out) + "\n")
+
+    return days_stats
 
 # =============================================================================
 # PART 2: ARDUINO-STYLE DATA PARSING (from fetch_all_smhi_data.py)
 # =============================================================================
 
-def parse_current_weather(data):
-    """Parse current weather (first entry) - Arduino style"""
-    if not data.get("timeSeries") or len(data["timeSeries"]) == 0:
-        return None
-
-    first_entry = data["timeSeries"][0]
-    current = {
-        "time": first_entry["validTime"],
-        "parameters": {}
-    }
-
-    for param in first_entry.get("parameters", []):
-        name = param.get("name")
-        values = param.get("values", [])
-        if name and values:
-            current["parameters"][name] = values[0]
-
-    return current
-
-def parse_hourly_forecast(data):
-    """Parse 3-hour forecast (Morning/Noon/Evening) - Arduino style"""
+@dataclass
+class DayForecast:
+    """One day of the 6-day forecast"""
+    # Explicit slots rather than slots=True, which needs Python 3.10
+    __slots__ = ("date", "day_name", "temp_min", "temp_max", "rain_chance",
+                 "symbol", "description", "entries_count")
+    date: date
+    day_name: str
+    temp_min: Optional[float]  # None if the day has no temperature values
+    temp_max: Optional[float]
+    rain_chance: float
+    symbol: int
+    description: str
+    entries_count: int
+
+def _extract_params(entry):
+    """Map parameter name to its first value for the parameters in ARDUINO_PARAMS"""
+    return {p["name"]: p["values"][0] for p in entry["parameters"]
+            if p["name"] in ARDUINO_PARAMS}
+
+def parse_all(data, today):
+    """Parse current weather, 3-hour and 6-day forecasts in one pass - Arduino style
+
+    Returns (current, hourly, forecast_days), or None if the payload is malformed.
+    """
     target_hours = [8, 13, 19]  # 8 AM, 1 PM, 7 PM
     hour_labels = ["Morning", "Noon", "Evening"]
     hourly = {label: None for label in hour_labels}
+    hourly_filled = 0
+    current = None
 
-    today = datetime.now().date()
-    tomorrow = today + timedelta(days=1)
-
-    for entry in data.get("timeSeries", []):
-        time_str = entry["validTime"]
-        dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-
-        if dt.date() in [today, tomorrow]:
-            hour = dt.hour
-
-            for i, target_hour in enumerate(target_hours):
-                if hour == target_hour and not hourly[hour_labels[i]]:
-                    params = {}
-                    for param in entry.get("parameters", []):
-                        name = param.get("name")
-                        values = param.get("values", [])
-                        if name and values:
-                            params[name] = values[0]
-
-                    hourly[hour_labels[i]] = {
-                        "time": time_str,
-                        "hour": hour,
-                        "parameters": params
-                    }
-
-    return hourly
-
-def parse_daily_forecast(data):
-    """Parse 6-day forecast - Arduino style"""
-    daily_data = defaultdict(lambda: {
-        "temp_min": 999,
-        "temp_max": -999,
-        "rain_chance": 0,
-        "symbol": 0,
-        "entries": []
-    })
-
-    for entry in data.get("timeSeries", []):
-        time_str = entry["validTime"]
-        dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-        date = dt.date()
-
-        params = {}
-        for param in entry.get("parameters", []):
-            name = param.get("name")
-            values = param.get("values", [])
-            if name and values:
-                params[name] = values[0]
-
-        if "t" in params:
-            temp = params["t"]
-            if temp < daily_data[date]["temp_min"]:
-                daily_data[date]["temp_min"] = temp
-            if temp > daily_data[date]["temp_max"]:
-                daily_data[date]["temp_max"] = temp
-
-        if "tstm" in params:
-            if params["tstm"] > daily_data[date]["rain_chance"]:
-                daily_data[date]["rain_chance"] = params["tstm"]
+    # Per-day columns indexed by day offset from today (only days 1-6 are kept)
+    day_temps = [[] for _ in range(FORECAST_DAYS + 1)]
+    day_rain = [[0] for _ in range(FORECAST_DAYS + 1)]
+    day_symbol = [0] * (FORECAST_DAYS + 1)
+    day_count = [0] * (FORECAST_DAYS + 1)
 
-        if "Wsymb2" in params and daily_data[date]["symbol"] == 0:
-            daily_data[date]["symbol"] = int(params["Wsymb2"])
+    tomorrow = today + timedelta(days=1)
 
-        daily_data[date]["entries"].append({
-            "time": dt.strftime("%H:%M"),
-            "params": params
-        })
+    try:
+        for index, entry in enumerate(data["timeSeries"]):
+            time_str = entry["validTime"]
+            dt = _parse_vt(time_str)
+            entry_date = dt.date()
+
+            params = _extract_params(entry)
+
+            # Current weather (first entry)
+            if index == 0:
+                current = {
+                    "time": time_str,
+                    "parameters": params
+                }
+
+            # 3-hour forecast (today/tomorrow), skipped once all slots are set
+            if hourly_filled < len(hour_labels) and (entry_date == today or entry_date == tomorrow):
+                hour = dt.hour
+
+                for i, target_hour in enumerate(target_hours):
+                    if hour == target_hour and not hourly[hour_labels[i]]:
+                        hourly[hour_labels[i]] = {
+                            "time": time_str,
+                            "hour": hour,
+                            "parameters": params
+                        }
+                        hourly_filled += 1
+                        break
+
+            # 6-day forecast
+            day = (entry_date - today).days
+            if 0 < day <= FORECAST_DAYS:
+                day_count[day] += 1
+
+                if (temp := params.get("t")) is not None:
+                    day_temps[day].append(temp)
+
+                if (tstm := params.get("tstm")) is not None:
+                    day_rain[day].append(tstm)
+
+                if day_symbol[day] == 0 and (symbol := params.get("Wsymb2")) is not None:
+                    day_symbol[day] = int(symbol)
+    except (KeyError, IndexError):
+        return None
 
-    today = datetime.now().date()
     forecast_days = []
 
-    for i in range(1, 7):
-        target_date = today + timedelta(days=i)
-        if target_date in daily_data:
-            day_data = daily_data[target_date]
-            forecast_days.append({
-                "date": target_date,
-                "day_name": target_date.strftime("%A"),
-                "temp_min": day_data["temp_min"] if day_data["temp_min"] < 999 else None,
-                "temp_max": day_data["temp_max"] if day_data["temp_max"] > -999 else None,
-                "rain_chance": day_data["rain_chance"],
-                "symbol": day_data["symbol"],
-                "description": WEATHER_SYMBOLS.get(day_data["symbol"], "Unknown"),
-                "entries_count": len(day_data["entries"])
-            })
-
-    return forecast_days
+    for i in range(1, FORECAST_DAYS + 1):
+        if day_count[i]:
+            target_date = today + timedelta(days=i)
+            temps = day_temps[i]
+            forecast_days.append(DayForecast(
+                date=target_date,
+                day_name=target_date.strftime("%A"),
+                temp_min=min(temps) if temps else None,
+                temp_max=max(temps) if temps else None,
+                rain_chance=max(day_rain[i]),
+                symbol=day_symbol[i],
+                description=WEATHER_SYMBOLS.get(day_symbol[i], "Unknown"),
+                entries_count=day_count[i]
+            ))
+
+    return current, hourly, forecast_days
 
 def display_arduino_style_data(current, hourly, forecast_days):
     """Display data as Arduino would use it"""
-    print("\n" + "=" * 80)
-    print("PART 2: ARDUINO-STYLE DATA PARSING")
-    print("=" * 80)
+    out = []
+    out.append("\n" + "=" * 80)
+    out.append("PART 2: ARDUINO-STYLE DATA PARSING")
+    out.append("=" * 80)
 
     # Current Weather
-    print("\n🌡️  CURRENT WEATHER:")
+    out.append("\n🌡️  CURRENT WEATHER:")
     if current:
-        dt = datetime.fromisoformat(current["time"].replace('Z', '+00:00'))
-        print(f"  Time:           {dt.strftime('%Y-%m-%d %H:%M UTC')}")
+        dt = _parse_vt(current["time"])
+        out.append(f"  Time:           {dt.strftime('%Y-%m-%d %H:%M UTC')}")
         params = current["parameters"]
-        print(f"  Temperature:    {params.get('t', 'N/A')}°C")
-        print(f"  Humidity:       {params.get('r', 'N/A')}%")
-        print(f"  Wind:           {params.get('ws', 'N/A')} m/s {get_wind_direction(params.get('wd'))}")
-        print(f"  Pressure:       {params.get('msl', 'N/A')} hPa")
+        out.append(f"  Temperature:    {params.get('t', 'N/A')}°C")
+        out.append(f"  Humidity:       {params.get('r', 'N/A')}%")
+        out.append(f"  Wind:           {params.get('ws', 'N/A')} m/s {get_wind_direction(params.get('wd'))}")
+        out.append(f"  Pressure:       {params.get('msl', 'N/A')} hPa")
         symbol = int(params.get('Wsymb2', 0))
-        print(f"  Weather:        {WEATHER_SYMBOLS.get(symbol, 'Unknown')}")
+        out.append(f"  Weather:        {WEATHER_SYMBOLS.get(symbol, 'Unknown')}")
 
     # Hourly Forecast
-    print("\n🕐 3-HOUR FORECAST:")
+    out.append("\n🕐 3-HOUR FORECAST:")
     for label in ["Morning", "Noon", "Evening"]:
         data = hourly.get(label)
         if data:
             params = data["parameters"]
-            print(f"  {label:8} ({data['hour']:02d}:00): {params.get('t', 'N/A')}°C, Wind {params.get('ws', 'N/A')} m/s, Rain {params.get('tstm', 'N/A')}%")
+            out.append(f"  {label:8} ({data['hour']:02d}:00): {params.get('t', 'N/A')}°C, Wind {params.get('ws', 'N/A')} m/s, Rain {params.get('tstm', 'N/A')}%")
         else:
-            print(f"  {label:8}: No data")
+            out.append(f"  {label:8}: No data")
 
     # Daily Forecast
-    print("\n📅 6-DAY FORECAST:")
+    out.append("\n📅 6-DAY FORECAST:")
     for i, day in enumerate(forecast_days, 1):
-        temp_range = f"{day['temp_max']:.1f}/{day['temp_min']:.1f}°C" if day['temp_min'] else "N/A"
-        print(f"  Day {i} ({day['day_name']:9}): {temp_range:12} Rain {day['rain_chance']:2.0f}% - {day['description']}")
+        temp_range = f"{day.temp_max:.1f}/{day.temp_min:.1f}°C" if day.temp_min else "N/A"
+        out.append(f"  Day {i} ({day.day_name:9}): {temp_range:12} Rain {day.rain_chance:2.0f}% - {day.description}")
+
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 # =============================================================================
@@ -371,14 +524,17 @@ def main():
     # Fetch data
     data = fetch_weather_data()
     print("✅ Data fetched successfully!\n")
+    today = datetime.now().date()
 
     # Part 1: Analyze API structure
-    days_data = analyze_api_structure(data)
+    days_stats = analyze_api_structure(data, today)
 
     # Part 2: Parse Arduino-style
-    current = parse_current_weather(data)
-    hourly = parse_hourly_forecast(data)
-    forecast_days = parse_daily_forecast(data)
+    parsed = parse_all(data, today)
+    if parsed is None:
+        print("❌ Unexpected forecast data format")
+        sys.exit(1)
+    current, hourly, forecast_days = parsed
     display_arduino_style_data(current, hourly, forecast_days)
 
     print("\n" + "=" * 80)